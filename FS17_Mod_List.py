@@ -1,11 +1,16 @@
 import os
 import re
 import sys
-
-import xml.etree.ElementTree as ET
+import pickle
+import shutil
+import hashlib
+from html import escape
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from collections import defaultdict
 
 from tiny_html import Tag, Html
-from fs17 import Mod
+from fs17 import ET, Mod, ICON_SAVE_TYPE
 
 # ============================================================================
 SAVE_DIR = r'~\Documents\My Games\FarmingSimulator2017\mods'
@@ -22,9 +27,41 @@ OUTPUT_FILE = '_FS7_Mod_List.html'
 
 A leading underscore ensures it is listed first in Explorer.'''
 
+OUTPUT_GZIP = False
+'''Also write a gzip compressed copy of the HTML file. (OUTPUT_FILE + '.gz')'''
+
+OUTPUT_FINGERPRINT = '.mod_list.sha256'
+'''File in the MOD_VAULT, to remember the inputs of the last HTML file.
+
+If no mod and no setting changed, the HTML file is not created again.
+Set to None to always create the HTML file.'''
+
 HTML_TITLE = 'FS17 - Mod List'
 '''The title of the HTML document.'''
 
+ICON_CACHE = '.icon_cache'
+'''Folder in the MOD_VAULT, to keep the converted icons for the next run.
+
+Set to None to convert all icons again on every run.'''
+
+ICON_CACHE_VERSION = 1
+'''Version of the icon cache files. Increase it, when their name or content changes.
+
+The icons are kept in a sub-folder per version, older versions are removed.'''
+
+ICON_FILES = None
+'''Folder in the MOD_VAULT, to store the icons as image files, which are linked by the HTML.
+
+Makes the HTML file a lot smaller. Set to None to embed the icons in the HTML file.'''
+
+MOD_CACHE = '.mod_cache.pickle'
+'''File in the MOD_VAULT, to keep the information of the mods for the next run.
+
+Only mods, whose ZIP file changed, are read again. Set to None to read all mods on every run.'''
+
+MOD_CACHE_VERSION = 5
+'''Version of the mod cache content. Increase it, when the Mod class changes.'''
+
 # ============================================================================
 # Constants for HTML generation.
 # Size (width and height) of the icons in the HTML.
@@ -39,58 +76,108 @@ def main() -> None:
     # ------------------------------------------------------------------------
     # Get the list of installed Mods. (ZIP files only)
     save_dir = os.path.expanduser(SAVE_DIR)
-    installed_mods = []
+    installed_mods = frozenset()
     if os.path.exists(save_dir):
         installed_mods = get_zipfiles(save_dir)
-        # Remove folders from filenames.
-        installed_mods = [os.path.basename(mod) for mod in installed_mods]
+        # Remove folders from filenames. (A set, for fast lookup.)
+        installed_mods = frozenset(os.path.basename(mod) for mod in installed_mods)
 
     # ------------------------------------------------------------------------
     # Get the list of Mods in the current folder.
-    print('Finding Mods in', os.path.abspath(MOD_VAULT))
-    list_of_zipfiles = get_zipfiles(MOD_VAULT)
+    # (Resolve the folder once, all paths below are derived from it.)
+    mod_vault = os.path.abspath(os.path.expanduser(MOD_VAULT))
+    print('Finding Mods in', mod_vault)
+    list_of_zipfiles = get_zipfiles(mod_vault)
     if len(list_of_zipfiles) <= 0:
-        print('***ERROR: No Mods (ZIP files) found in:',
-              os.path.abspath(MOD_VAULT))
+        print('***ERROR: No Mods (ZIP files) found in:', mod_vault)
         sys.exit(-1)
+    stamps = {zipfile: get_file_stamp(zipfile) for zipfile in list_of_zipfiles}
+
+    # ------------------------------------------------------------------------
+    # Nothing to do, if neither the mods nor the settings changed since the last run.
+    out_file = os.path.join(mod_vault, OUTPUT_FILE)
+    fingerprint_file = None
+    fingerprint = get_fingerprint(stamps, installed_mods)
+    icon_folder = None
+    if ICON_FILES is not None:
+        icon_folder = os.path.join(mod_vault, ICON_FILES)
+    if OUTPUT_FINGERPRINT is not None:
+        fingerprint_file = os.path.join(mod_vault, OUTPUT_FINGERPRINT)
+        if is_up_to_date(out_file, fingerprint_file, fingerprint, icon_folder):
+            print(f'HTML file is up to date: {out_file}')
+            return
+
+    # ------------------------------------------------------------------------
+    # Prepare the icon cache folder.
+    icon_cache = None
+    if ICON_CACHE is not None:
+        icon_cache = prepare_icon_cache(mod_vault, os.path.join(mod_vault, ICON_CACHE))
+    # Prepare the folder for the linked icon files.
+    if icon_folder is not None:
+        os.makedirs(icon_folder, exist_ok=True)
+
+    # ------------------------------------------------------------------------
+    # Take the mods from the mod cache, whose ZIP file didn't change since the last run.
+    mod_cache_file = None
+    if MOD_CACHE is not None:
+        mod_cache_file = os.path.join(mod_vault, MOD_CACHE)
+    mod_cache = load_mod_cache(mod_cache_file)
+    new_mod_cache = {}
+    cached_mods = {}
+    for zipfile, stamp in stamps.items():
+        cached = mod_cache.get(zipfile)
+        if cached is not None and cached[0] == stamp:
+            cached_mods[zipfile] = cached[1]
+    zipfiles_to_read = [zipfile for zipfile in list_of_zipfiles if zipfile not in cached_mods]
 
     # ------------------------------------------------------------------------
     mods = {}
 
     # ------------------------------------------------------------------------
     # Read MOD information and prepare HTML content.
+    # The mods are independent of each other, so they are read in parallel
+    # by a pool of worker processes. The HTML is built here, in the main process.
     num_mods = len(list_of_zipfiles)
-    print(f'Reading information for {num_mods} mods...')
-    for _idx, zipfile in enumerate(list_of_zipfiles):
-        # ------------------------------------------------------------------------
-        # Show progress.
-        print(_idx+1, 'of', len(list_of_zipfiles), zipfile)
-        # ------------------------------------------------------------------------
-        # Collect information about the mod.
-        try:
-            mod = Mod(zipfile, GAME_DIR, IMG_SIZE)
-        except KeyError as e:
-            print(f"\n***WARNING: Couldn't open file {zipfile}:")
-            print(e)
-            continue
-        except ET.ParseError as e:
-            print(
-                f'\n***WARNING: Error opening modDesc.xml in file {zipfile}:')
-            print(e)
-            continue
-        # ------------------------------------------------------------------------
-        # Create a HTML representation for the mod.
-        div, mod, icon, info, desc = create_mod_html(mod, installed_mods)
-        # ------------------------------------------------------------------------
-        # Determine Category from folder name.
-        cat = os.path.dirname(zipfile)
-        if cat != MOD_VAULT:
-            cat = os.path.basename(cat)
-        else:
-            cat = 'None'
-        # ------------------------------------------------------------------------
-        mod_list = mods.setdefault(cat, {}).setdefault(mod.title.upper(), [])
-        mod_list.append((div, mod, icon, info, desc))
+    print(f'Reading information for {num_mods} mods... ({len(cached_mods)} unchanged)')
+    # The results are consumed while the workers are still busy with later mods.
+    # (They come in the order of zipfiles_to_read, which is the order of list_of_zipfiles.)
+    # The default number of workers is one per CPU, limited to 61 on Windows.
+    with ProcessPoolExecutor() as executor:
+        results = executor.map(read_mod, zipfiles_to_read, repeat(GAME_DIR),
+                               repeat(IMG_SIZE), repeat(icon_cache), chunksize=4)
+        for _idx, zipfile in enumerate(list_of_zipfiles):
+            # ------------------------------------------------------------------------
+            # Show progress.
+            print(_idx+1, 'of', num_mods, zipfile)
+            # ------------------------------------------------------------------------
+            if zipfile in cached_mods:
+                mod, warning = cached_mods[zipfile], None
+            else:
+                mod, warning = next(results)
+            # ------------------------------------------------------------------------
+            if warning:
+                print(warning)
+            # Skip mods, which could not be read.
+            if mod is None:
+                continue
+            new_mod_cache[zipfile] = (stamps[zipfile], mod)
+            # ------------------------------------------------------------------------
+            # Create a HTML representation for the mod.
+            mod, icon, info, desc = create_mod_html(mod, installed_mods, mod_vault, icon_folder)
+            # ------------------------------------------------------------------------
+            # Determine Category from folder name.
+            cat = os.path.dirname(zipfile)
+            if cat != mod_vault:
+                cat = os.path.basename(cat)
+            else:
+                cat = 'None'
+            # ------------------------------------------------------------------------
+            mod_list = mods.setdefault(cat, {}).setdefault(mod.title.upper(), [])
+            mod_list.append((mod, icon, info, desc))
+
+    # ------------------------------------------------------------------------
+    # Keep the mods for the next run. (Removed ZIP files are dropped from the cache.)
+    save_mod_cache(mod_cache_file, new_mod_cache)
 
     # ------------------------------------------------------------------------
     # Create the HTML document from the list of mods.
@@ -98,9 +185,14 @@ def main() -> None:
 
     # ------------------------------------------------------------------------
     # Write the HTML document into the MOD_VAULT folder.
-    out_file = os.path.abspath(os.path.join(MOD_VAULT, OUTPUT_FILE))
     print(f'Writing HTML file: {out_file} ...')
     doc.save(out_file)
+    if OUTPUT_GZIP:
+        print(f'Writing HTML file: {out_file}.gz ...')
+        doc.save(out_file + '.gz')
+    # ------------------------------------------------------------------------
+    # Remember the inputs of this HTML file.
+    save_fingerprint(fingerprint_file, fingerprint)
     # ------------------------------------------------------------------------
 
 
@@ -115,7 +207,7 @@ def create_html_doc(mods: dict) -> Html:
     # Create a <head> tag.
     html.head.tag('title', text=HTML_TITLE)
     with open('styles.css', 'rt') as css:
-        html.head.tag('style', {'type': 'text/css'}, text=css.read())
+        html.head.tag('style', {'type': 'text/css'}, text=css.read(), raw=True)
     # ------------------------------------------------------------------------
     # Keep track of global mod number.
     mod_number = 0
@@ -128,34 +220,40 @@ def create_html_doc(mods: dict) -> Html:
     # Hide categories row, if mods are stored in main folder. (e.g. no categories defined.)
     show_categories = not ((len(mods) <= 1) and ('None' in mods))
     # ------------------------------------------------------------------------
-    all_cats = sorted(mods)[:]
+    all_cats = sorted(mods)
+    # Visible names of the categories, without leading digits. (Needed for every navigation row.)
+    vis_cats = {cat: get_visible_category(cat) for cat in all_cats}
+    # ------------------------------------------------------------------------
+    # The navigation row for the categories is the same in every category row.
+    # It is created once and frozen, so its HTML is created only once, too.
+    if show_categories:
+        links = Tag('small', text='&nbsp;&nbsp;&nbsp;&nbsp;', raw=True)
+        for other_cat in all_cats:
+            vis_other_cat = vis_cats[other_cat]
+            links.tag('a', {'href': f'#Cat_{other_cat}',
+                      'class': 'fsgreen'}, text=vis_other_cat)
+            links.tag('span', text='&nbsp;&nbsp;', raw=True)
+        links.freeze()
+    # ------------------------------------------------------------------------
     for cat in all_cats:
         # ------------------------------------------------------------------------
-        m = re.match('\d+_(.*)', cat)
-        vis_cat = m.group(1) if m else cat
+        vis_cat = vis_cats[cat]
         # ------------------------------------------------------------------------
         if show_categories:
             # ------------------------------------------------------------------------
             td = table.tag('tr', {'class': 'category', 'id': f'Cat_{cat}'}).tag(
                 'td', {'colspan': '4'})
             td.tag('i').tag('small', text='Mod-Category')
-            links = td.tag('small', text='&nbsp;&nbsp;&nbsp;&nbsp;')
-            # ------------------------------------------------------------------------
             # Show navigation row for categories.
-            for other_cat in all_cats:
-                m = re.match('\d+_(.*)', other_cat)
-                vis_other_cat = m.group(1) if m else other_cat
-                links.tag('a', {'href': f'#Cat_{other_cat}',
-                          'class': 'fsgreen'}, text=vis_other_cat)
-                links.tag('span', text='&nbsp;&nbsp;')
+            td.add(links)
             # ------------------------------------------------------------------------
             # Show category, without leading digits.
             td.tag('h1', text=f'{vis_cat}')
         # ------------------------------------------------------------------------
         # Show all mods in the current category.
-        for name in sorted(mods[cat]):
-            mod_list = mods[cat][name]
-            for _, mod, icon, info, desc in mod_list:
+        # (The names are upper case already, so they are sorted only once, without case folding.)
+        for _name, mod_list in sorted(mods[cat].items()):
+            for mod, icon, info, desc in mod_list:
                 mod_number += 1
                 create_mod_row(mod_number, mod, table,
                                icon, info, desc, vis_cat)
@@ -163,123 +261,393 @@ def create_html_doc(mods: dict) -> Html:
     return html
 
 
+# ============================================================================
+# Leading digits of a category folder, which are used for sorting only.
+CATEGORY_RE = re.compile(r'\d+_(.*)')
+
+
+# ============================================================================
+# Get the name of a category, as it is shown. (Without the leading digits.)
+def get_visible_category(cat: str) -> str:
+    m = CATEGORY_RE.match(cat)
+    return m.group(1) if m else cat
+
+
+# ============================================================================
+# Get the stamp of a file, which changes when the file is changed.
+def get_file_stamp(filename: str) -> tuple:
+    try:
+        st = os.stat(filename)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+# ============================================================================
+# Get a fingerprint of everything the HTML file is created from:
+# the ZIP files, the installed mods, the style sheet, the settings and the format of the icons.
+def get_fingerprint(stamps: dict, installed_mods: frozenset) -> str:
+    # ------------------------------------------------------------------------
+    settings = (MOD_CACHE_VERSION, GAME_DIR, IMG_SIZE, HTML_TITLE, ICON_FILES, OUTPUT_GZIP,
+                ICON_CACHE_VERSION, ICON_SAVE_TYPE,
+                get_file_stamp('styles.css'), sorted(installed_mods))
+    fingerprint = hashlib.sha256(repr(settings).encode())
+    for zipfile in sorted(stamps):
+        fingerprint.update(repr((zipfile, stamps[zipfile])).encode())
+    # ------------------------------------------------------------------------
+    return fingerprint.hexdigest()
+
+
+# ============================================================================
+# Check, if the HTML file was created from the same inputs already.
+def is_up_to_date(out_file: str, fingerprint_file: str, fingerprint: str, icon_folder: str = None) -> bool:
+    # ------------------------------------------------------------------------
+    if not os.path.exists(out_file):
+        return False
+    if OUTPUT_GZIP and not os.path.exists(out_file + '.gz'):
+        return False
+    # The HTML file links the icons in the icon folder, if there is one.
+    if icon_folder is not None and not os.path.isdir(icon_folder):
+        return False
+    # ------------------------------------------------------------------------
+    try:
+        with open(fingerprint_file, 'rt') as f_in:
+            return f_in.read().strip() == fingerprint
+    except OSError:
+        return False
+
+
+# ============================================================================
+# Save the fingerprint of the inputs of the HTML file.
+def save_fingerprint(fingerprint_file: str, fingerprint: str) -> None:
+    # ------------------------------------------------------------------------
+    if fingerprint_file is None:
+        return
+    # ------------------------------------------------------------------------
+    # Write to a temporary file first, so an interrupted run leaves no broken file.
+    tmp_file = fingerprint_file + '.tmp'
+    try:
+        with open(tmp_file, 'wt') as f_out:
+            f_out.write(fingerprint)
+        os.replace(tmp_file, fingerprint_file)
+    except OSError as e:
+        print(f'***WARNING: Could not write the fingerprint {fingerprint_file}:\n{e!r}')
+
+
+# ============================================================================
+# Names of the icon cache files and folders of all versions.
+# (Only these are ever removed from the cache folder.)
+ICON_CACHE_DIR_RE = re.compile(r'v\d+')
+ICON_CACHE_FILE_TYPES = ('.img', '.b64', '.icon')
+
+
+# ============================================================================
+# Create the folder of the current icon cache version in the given cache folder and return it.
+# The icon cache files and folders of other versions are removed, nothing else.
+# Returns None (no caching), if the cache folder is not a sub-folder of the MOD_VAULT.
+def prepare_icon_cache(mod_vault: str, cache_dir: str) -> str:
+    # ------------------------------------------------------------------------
+    # Never clean up the MOD_VAULT itself, or any folder outside of it.
+    vault = os.path.normcase(os.path.realpath(mod_vault))
+    cache = os.path.normcase(os.path.realpath(cache_dir))
+    try:
+        inside = os.path.commonpath([vault, cache]) == vault
+    except ValueError:
+        inside = False  # (Different drives on Windows.)
+    if cache == vault or not inside:
+        print(f'***WARNING: ICON_CACHE must be a sub-folder of the MOD_VAULT, icons are not cached: {cache_dir}')
+        return None
+    # ------------------------------------------------------------------------
+    version_dir = f'v{ICON_CACHE_VERSION}'
+    os.makedirs(os.path.join(cache_dir, version_dir), exist_ok=True)
+    # ------------------------------------------------------------------------
+    # (The cache is optional, so errors are ignored.)
+    for entry in os.scandir(cache_dir):
+        if entry.name == version_dir:
+            continue
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                if ICON_CACHE_DIR_RE.fullmatch(entry.name):
+                    shutil.rmtree(entry.path)
+            elif entry.name.endswith(ICON_CACHE_FILE_TYPES):
+                os.remove(entry.path)
+        except OSError:
+            pass
+    # ------------------------------------------------------------------------
+    return os.path.join(cache_dir, version_dir)
+
+
+# ============================================================================
+# Load the mod cache of the last run.
+# Returns a dictionary {zipfile: (stamp, mod)}, which is empty, if there is no usable cache.
+def load_mod_cache(cache_file: str) -> dict:
+    # ------------------------------------------------------------------------
+    if cache_file is None or not os.path.exists(cache_file):
+        return {}
+    # ------------------------------------------------------------------------
+    try:
+        with open(cache_file, 'rb') as f_in:
+            settings, mod_cache = pickle.load(f_in)
+    except Exception as e:
+        # A broken cache only means, that all mods are read again.
+        print(f'***WARNING: Ignoring the mod cache {cache_file}:\n{e!r}')
+        return {}
+    # ------------------------------------------------------------------------
+    # The cached mods are only valid for the same settings.
+    if settings != (MOD_CACHE_VERSION, GAME_DIR, IMG_SIZE, ICON_SAVE_TYPE):
+        return {}
+    return mod_cache
+
+
+# ============================================================================
+# Save the mod cache for the next run.
+def save_mod_cache(cache_file: str, mod_cache: dict) -> None:
+    # ------------------------------------------------------------------------
+    if cache_file is None:
+        return
+    # ------------------------------------------------------------------------
+    # Write to a temporary file first, so an interrupted run leaves no broken cache file.
+    # (The cache is optional, so errors are only reported.)
+    tmp_file = cache_file + '.tmp'
+    try:
+        with open(tmp_file, 'wb') as f_out:
+            pickle.dump(((MOD_CACHE_VERSION, GAME_DIR, IMG_SIZE, ICON_SAVE_TYPE), mod_cache), f_out,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, cache_file)
+    except OSError as e:
+        print(f'***WARNING: Could not write the mod cache {cache_file}:\n{e!r}')
+
+
+# ============================================================================
+# Read the information of a single mod. (Executed in a worker process.)
+def read_mod(zipfile: str, game_dir: str, img_size: int, icon_cache: str) -> tuple:
+    """Return a tuple (mod, warning); mod is None, if the ZIP file could not be read.
+
+    The warnings are returned instead of printed, so the main process can show
+    them together with the progress line of the mod.
+    """
+    try:
+        # Reject broken files quickly, before ZipFile searches them for a directory.
+        if not has_zip_signature(zipfile):
+            return None, f'\n***WARNING: Not a ZIP file: {zipfile}'
+        mod = Mod(zipfile, game_dir, img_size, icon_cache)
+        return mod, ('\n' + '\n'.join(mod.warnings)) if mod.warnings else None
+    except KeyError as e:
+        return None, f"\n***WARNING: Couldn't open file {zipfile}:\n{e}"
+    except ET.ParseError as e:
+        return None, f'\n***WARNING: Error opening modDesc.xml in file {zipfile}:\n{e}'
+    except Exception as e:
+        # Any other broken mod shall not stop the whole list.
+        return None, f'\n***WARNING: Error reading file {zipfile}:\n{e!r}'
+
+
 # ============================================================================
 # Create the table row for the given mod.
-def create_mod_row(mod_number: int, mod: Mod, table: Tag, icon: Tag, info: Tag, desc: Tag, vis_cat: str):
-    tr = table.tag('tr')
-    cls = {'class': 'instDiv'} if mod.is_installed else {}
-    ncls = {'class': 'none' if mod.is_installed else 'fsgreen',
-             'style': 'text-align:right'}
-    num_td = tr.tag('td', cls)
-    num_td.tag('h1', ncls, text=str(mod_number))
-    
-    icon_td = tr.tag('td', cls)
-    icon_td.add(icon)
-    icon_td.tag('div').tag('i').tag('small', {'class': 'item_cat'}, text='/'+vis_cat+'/')
-    
-    info_td = tr.tag('td', cls)
-    info_td.add(info)
-    
-    tr.tag('td', {'class': 'desc'}).add(desc)
+# The row has a fixed structure, so it is filled in from MOD_ROW_HTML,
+# instead of building a tree of Tag objects for every mod.
+def create_mod_row(mod_number: int, mod: Mod, table: Tag, icon: tuple, info: str, desc: str, vis_cat: str):
+    # ------------------------------------------------------------------------
+    row_start, row_icon_end, row_info_end, row_end = MOD_ROW_HTML
+    cls, num_cls = MOD_ROW_CLASSES[mod.is_installed]
+    # ------------------------------------------------------------------------
+    # All parts of the row are added to the table at once:
+    # Column 0: The number of the mod.
+    # Column 1: The icon and the category.
+    # Column 2 and 3: Information and description.
+    table.extend((row_start.format(cls=cls, num_cls=num_cls, number=mod_number),
+                  *icon,
+                  row_icon_end.format(category=escape(vis_cat), cls=cls),
+                  info, row_info_end, desc, row_end))
 
 
 # ============================================================================
-# Create a HTML representation for the mod.
-def create_mod_html(mod: Mod, installed_mods: list) -> Tag:
+# HTML templates for the parts of the mod rows.
+# Filled in by create_mod_html(), all values must be escaped already.
+MOD_ROW_HTML = (
+    '<tr>\n'
+    '<td{cls}><h1 class="{num_cls}" style="text-align:right">{number}</h1></td>\n'
+    '<td{cls}>\n',
+    # ... the icon of the mod ...
+    '<div><i><small class="item_cat">/{category}/</small></i></div>\n'
+    '</td>\n'
+    '<td{cls}>\n',
+    # ... the information of the mod ...
+    '</td>\n'
+    '<td class="desc">\n',
+    # ... the description of the mod ...
+    '</td>\n'
+    '</tr>\n')
+'''The table row of a mod, as the parts between icon, information and description.'''
+
+MOD_ROW_CLASSES = {True: (' class="instDiv"', 'none'), False: ('', 'fsgreen')}
+'''The (cls, num_cls) values of MOD_ROW_HTML for installed and not installed mods.'''
+
+MOD_ICON_HTML = ('<img src="', '" width="{size}" height="{size}"/>\n')
+'''The icon of a mod, as the parts before and after the image source.'''
+
+DATA_URL = 'data:{type};base64,'
+'''Start of the image source for embedded icons.'''
+
+ICON_FILE_TYPES = {'image/png': '.png', 'image/webp': '.webp'}
+'''File extensions of the icons in the ICON_FILES folder.'''
+
+MOD_INFO_HTML = (
+    '<div>\n'
+    '<div{title_cls}><b>{title}</b></div>\n'
+    '<i><small><a href="{zipfile_rel}">{zipfile}</a>\n'
+    '<a class="fsgreen" target="_blank" href="{modhub}">(on ModHub?)</a></small></i>\n'
+    '<div>Version: {version}</div>\n'
+    '<div><small>Author: {author}</small></div>\n'
+    '<div><small>Installed:{installed}</small></div>\n'
+    '<div><small>Multiplayer:{multiplayer}</small></div>\n'
+    '<table class="item_list">\n'
+    '<tr class="item_list"><td colspan="5" class="item_list"><div><small></small></div></td></tr>\n'
+    '{items}'
+    '</table>\n'
+    '</div>\n')
+'''Name and information of a mod, including the table of store items.'''
+
+ITEM_CAT_HTML = ('<tr class="item_list"><td colspan="5" class="item_list">'
+                 '<div><small class="item_cat">{category}</small></div></td></tr>\n')
+'''A category row in the table of store items.'''
+
+ITEM_HTML = (
+    '<tr class="item_list"><td class="item_list">&nbsp;&nbsp;</td>'
+    '<td class="item_list"><small class="brand">{brand}</small></td>'
+    '<td class="item_list"><small class="item_name">&nbsp;&nbsp;{name}</small></td>'
+    '<td class="item_list" style="text-align:right"><small class="item_price">'
+    '&nbsp;&nbsp;<code>$&nbsp;{price}</code></small></td>'
+    '<td class="item_list" style="text-align:right"><small class="item_upkeep">'
+    '&nbsp;&nbsp;<code>(${upkeep}/d)</code></small></td></tr>\n')
+'''A row in the table of store items.'''
+
+MOD_DESC_HTML = '<small>{description}</small>\n'
+'''The detailed description of a mod.'''
+
+MODHUB_URL = 'https://farming-simulator.com/mods.php?title=fs2017&lang=en&searchMod='
+'''URL to search for a mod on the ModHub.'''
+
+
+# ============================================================================
+# Create the HTML representation for the mod.
+# The parts are plain HTML strings, created from the templates above.
+# (No Tag objects, as they would be serialized only once anyway.)
+def create_mod_html(mod: Mod, installed_mods: frozenset, mod_vault: str, icon_folder: str = None) -> tuple:
     # ------------------------------------------------------------------------
     zipfile = mod.zipfile
     is_installed = zipfile in installed_mods
-    zipfile_rel = os.path.relpath(mod.fullfile, MOD_VAULT)
+    # The ZIP files were found inside the (absolute) mod_vault folder,
+    # so the relative path is just the rest of the path.
+    zipfile_rel = mod.fullfile[len(os.path.join(mod_vault, '')):]
     mod.is_installed = is_installed
     # ------------------------------------------------------------------------
-    # A new DIV, to contain the Mod description.
-    div = Tag('div', {'class': 'instDiv'} if is_installed else {})
+    # Column 1: The image/Icon (embedded, or linked from disk)
+    # (Base64 and file URLs need no escaping.)
+    # The (large) Base64 string is kept as a fragment of its own, and not copied again.
+    icon_start, icon_end = MOD_ICON_HTML
+    icon_end = icon_end.format(size=IMG_SIZE)
+    # (An icon, which could not be saved as file, is embedded instead.)
+    icon_file = None
+    if not mod.icon_url and icon_folder is not None:
+        icon_file = save_icon_file(mod, icon_folder)
+    if mod.icon_url:
+        icon = (icon_start, mod.icon_url, icon_end)
+    elif icon_file is not None:
+        icon = (icon_start, escape(f'{ICON_FILES}/{icon_file}'), icon_end)
+    else:
+        icon = (icon_start, DATA_URL.format(type=mod.icon_type), mod.icon_b64, icon_end)
     # ------------------------------------------------------------------------
-    # Create a table (with a single row) for the Mod description.
-    # 1st column: The Icon
-    # 2nd column: Name, version, author, etc.
-    # 3rd column: Detailed description text
-    tbl = div.tag('table')
-    tr = tbl.tag('tr')
-    # ------------------------------------------------------------------------
-    # 3 Cells for the 3 columns
-    td1 = tr.tag('td')
-    td2 = tr.tag('td')
-    td3 = tr.tag('td', {'class': 'desc'})
+    # Prepare Store Item table
+    item_cats = defaultdict(list)
+    for item in mod.store_items:
+        item_cats[item.category].append(item)
     # ------------------------------------------------------------------------
-    # Column 1: The image/Icon
-    icon = td1.tag('img', {'src': 'data:image/png;base64,' + mod.icon_b64,
-                           'width': str(IMG_SIZE), 'height': str(IMG_SIZE)})
+    # The categories are sorted, the items keep their order within a category.
+    items = []
+    for item_cat, cat_items in sorted(item_cats.items()):
+        vis_item_cat = item_cat[:1].upper() + item_cat[1:] + ':'
+        items.append(ITEM_CAT_HTML.format(category=escape(vis_item_cat)))
+        for item in cat_items:
+            items.append(ITEM_HTML.format(brand=escape(item.brand), name=escape(item.name),
+                                          price=escape(item.price_str), upkeep=escape(item.dailyUpkeep)))
     # ------------------------------------------------------------------------
     # Column 2: Name and information.
-    info = td2.tag('div')
-    info.tag('div', {'class': 'fsgreen'} if not is_installed else {}).tag(
-        'b', text=f'{mod.title}')
-    zip_small = info.tag('i').tag('small')
-    zip_small.tag('a', {'href': zipfile_rel}, text=zipfile)
-
-    info.tag('div', text='Version: ' + mod.version)
-    info.tag('div').tag('small', text='Author: ' + mod.author)
-    info.tag('div').tag('small', text='Installed:' + str(is_installed))
-    info.tag('div').tag('small', text='Multiplayer:' + str(mod.multiplayer))
     search_term = mod.title.replace(' ', '+')
-    modhub = 'https://farming-simulator.com/mods.php?title=fs2017&lang=en&searchMod='
-    # zip_small.tag('div').tag('small').tag('a', {"target": "_blank", 'href': modhub+search_term}, text='ModHub')
-    zip_small.tag('a', {'class':'fsgreen', "target": "_blank", 'href': modhub+search_term}, text='(on ModHub?)')
-
+    info = MOD_INFO_HTML.format(
+        title_cls='' if is_installed else ' class="fsgreen"',
+        title=escape(mod.title),
+        zipfile_rel=escape(zipfile_rel),
+        zipfile=escape(zipfile),
+        modhub=escape(MODHUB_URL + search_term),
+        version=escape(mod.version),
+        author=escape(mod.author),
+        installed=is_installed,
+        multiplayer=mod.multiplayer,
+        items=''.join(items))
     # ------------------------------------------------------------------------
-    # Prepare Store Item table
-    num_items = len(mod.store_items)
-    item_cats = {}
-    for item in mod.store_items:
-        cat_list = item_cats.setdefault(item.category, [])
-        cat_list.append(item)
+    # Column 3: Detailed Mod description (with line breaks)
+    desc = MOD_DESC_HTML.format(description=escape(mod.description).replace('\n', '<br>\n'))
     # ------------------------------------------------------------------------
-    itm_tbl = info.tag('table', {'class': 'item_list'})
+    return mod, icon, info, desc
+
+
+# ============================================================================
+# Save the icon of the mod as image file into the given folder, and return its name.
+# The files are named after their content, so unchanged icons are not written again.
+# Returns None, if the file could not be written.
+def save_icon_file(mod: Mod, icon_folder: str) -> str:
     # ------------------------------------------------------------------------
-    # Show number of store items in the mod.
-    # itm_tbl.tag('tr', {'class': 'item_list'}).tag('td', {'colspan': '5', 'class': 'item_list'}).tag('div').tag('small', text=f'Store Items: {num_items}')
-    itm_tbl.tag('tr', {'class': 'item_list'}).tag('td', {'colspan': '5', 'class': 'item_list'}).tag('div').tag('small', text=f'')
+    icon_hash = hashlib.sha1(mod.icon_data).hexdigest()[:16]
+    icon_file = icon_hash + ICON_FILE_TYPES[mod.icon_type]
+    icon_path = os.path.join(icon_folder, icon_file)
     # ------------------------------------------------------------------------
-    for item_cat in sorted(item_cats):
-        vis_item_cat = item_cat[:1].upper() + item_cat[1:] + ':'
-        itm_tbl.tag('tr', {'class': 'item_list'}).tag('td', {'colspan': '5', 'class': 'item_list'}).tag(
-            'div').tag('small', {'class': 'item_cat'}, text=f'{vis_item_cat}')
-        for item in item_cats[item_cat]:
-            itm_row = itm_tbl.tag('tr', {'class': 'item_list'})
-            itm_row.tag('td', {'class': 'item_list'}, text='&nbsp;&nbsp;')
-            itm_row.tag('td', {'class': 'item_list'}).tag(
-                'small', {'class': 'brand'}, text=f'{item.brand}')
-            itm_row.tag('td', {'class': 'item_list'}).tag(
-                'small', {'class': 'item_name'}, text=f'&nbsp;&nbsp;{item.name}')
-            item_price = int(item.price)
-            itm_row.tag('td', {'class': 'item_list', 'style': 'text-align:right'}).tag(
-                'small', {'class': 'item_price'}, text=f'&nbsp;&nbsp;<code>$&nbsp;{item_price:,}</code>')
-            itm_row.tag('td', {'class': 'item_list', 'style': 'text-align:right'}).tag(
-                'small', {'class': 'item_upkeep'}, text=f'&nbsp;&nbsp;<code>(${item.dailyUpkeep}/d)</code>')
-    # ------------------------------------------------------------------------
-    # Column 3: Detailed Mod description
-    desc = td3.tag('small', text=mod.description)
-    # ------------------------------------------------------------------------
-    return div, mod, icon, info, desc
+    if not os.path.exists(icon_path):
+        # Write to a temporary file first, so an interrupted run leaves no broken icon file.
+        tmp_file = icon_path + '.tmp'
+        try:
+            with open(tmp_file, 'wb') as f_out:
+                f_out.write(mod.icon_data)
+            os.replace(tmp_file, icon_path)
+        except OSError as e:
+            # A single icon shall not stop the whole list.
+            print(f'\n***WARNING: Could not write the icon file {icon_path} of {mod.fullfile}:\n{e!r}')
+            return None
+    # ------------------------------------------------------------------------
+    return icon_file
 
 
 # ============================================================================
 # Get a list of zip files in the given folder.
+# ("~" must be expanded by the caller already.)
 def get_zipfiles(folder: str) -> list:
     # ------------------------------------------------------------------------
-    # Convert "~" into the users home folder.
-    folder = os.path.expanduser(folder)
     zipfiles = []
     # ------------------------------------------------------------------------
-    # Get all zip files in folder.
-    for root, _, files in os.walk(folder):
-        zipfiles += [os.path.join(root, filename)
-                     for filename in files if filename.endswith('.zip')]
+    # Get all zip files in folder and its sub-folders.
+    # (os.scandir() already knows, which entries are folders. No extra stat() calls.)
+    folders = [folder]
+    while folders:
+        try:
+            entries = os.scandir(folders.pop())
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    folders.append(entry.path)
+                elif entry.name.endswith('.zip'):
+                    zipfiles.append(entry.path)
     # ------------------------------------------------------------------------
     return zipfiles
 
 
+# ============================================================================
+# Check the first bytes of the file for the signature of a ZIP file.
+def has_zip_signature(filename: str) -> bool:
+    with open(filename, 'rb') as f_in:
+        return f_in.read(4) == b'PK\x03\x04'
+
+
 # ============================================================================
 if __name__ == '__main__':
     main()
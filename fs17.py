@@ -1,17 +1,105 @@
 """ Module to provide Farming Simulator 17 related functions and classes.
 """
 
-import xml.etree.ElementTree as ET
-
 import os
 import re
+import functools
+import pathlib
 from zipfile import ZipFile
 from io import BytesIO
-import base64
 
 
 # Pillow Image library (pip install pillow)
-from PIL import Image
+# (pillow-simd is a faster drop-in replacement for it.)
+from PIL import Image, UnidentifiedImageError, features
+
+# File types of icons, which are linked instead of embedded, if outside of the ZIP file.
+_WEB_IMAGE_TYPES = ('.png', '.jpg', '.jpeg')
+
+# Image formats of the Mod icons, in the order to check them.
+_ICON_FORMATS = ('DDS', 'PNG', 'JPEG')
+
+# Format and MIME type of the converted icons.
+# WEBP is a lot smaller than PNG, but Pillow may be built without it.
+# (The type is public, so the caller can tell, when the converted icons change.)
+if features.check('webp'):
+    _ICON_SAVE_FORMAT, ICON_SAVE_TYPE = 'WEBP', 'image/webp'
+else:
+    _ICON_SAVE_FORMAT, ICON_SAVE_TYPE = 'PNG', 'image/png'
+
+# Converted icons from ZIP files by (CRC, size, IMG_SIZE) of the icon file.
+# Many mods ship the same icon, which is only converted once per process.
+_ZIP_ICONS = {}
+
+# Buffer for the conversion of the icons, reused for all icons.
+# (Each worker process converts one icon at a time.)
+_ICON_BUFFER = BytesIO()
+
+# Resampling filter for scaling the icons. (Pillow < 9.1 has no Image.Resampling)
+_RESAMPLE = getattr(Image, 'Resampling', Image).LANCZOS
+
+# pybase64 encodes with SIMD instructions, many times faster than the
+# standard base64 module (pip install pybase64), but it is optional.
+try:
+    from pybase64 import b64encode_as_string as _b64encode
+except ImportError:
+    import base64
+
+    def _b64encode(data) -> str:
+        return base64.b64encode(data).decode('ascii')
+
+# lxml is a lot faster than the standard ElementTree (pip install lxml),
+# but it is optional. Both provide the same API for our purposes.
+# XML files are always decoded as UTF-8.
+try:
+    from lxml import etree as ET
+    # For the (many) well-formed XML files.
+    _STRICT_PARSER = ET.XMLParser(encoding='utf-8', remove_comments=True)
+    # Recover from the remaining XML errors, which _fix_xml() doesn't catch.
+    _XML_PARSER = ET.XMLParser(encoding='utf-8', recover=True, remove_comments=True)
+except ImportError:
+    import xml.etree.ElementTree as ET
+    _STRICT_PARSER = None
+    _XML_PARSER = None
+
+# The top level tags of the modDesc.xml, which are used.
+# (The content of all others is dropped while parsing.)
+_MOD_DESC_TAGS = frozenset(('title', 'iconFilename', 'author', 'version', 'description',
+                            'multiplayer', 'maps', 'storeItems', 'l10n'))
+
+# Plain text replacements for a few issues with the XML files of some mods.
+# (On the raw bytes of the files, no need to decode them first.)
+_XML_FIXES = {
+    # Ampersand is not allowed raw!
+    b' & ': b' and ',
+    # -- is not allowed raw!
+    b'Fill--and': b'Fill-and',
+    # Some spaces are missing in some files.
+    b'partOfEconomy="true"': b'partOfEconomy="true" ',
+    b'"configFilename=': b'" configFilename=',
+    b'"baleTypesDirectory=': b'" baleTypesDirectory=',
+    # Some more invalid tokens in Beta mods.
+    b'Bressel&Lade': b'Bressel+Lade',
+    b'and enjoy.]]></de>': b'and enjoy.</de>',
+
+    b'"endTransLimit="': b'" endTransLimit="',
+    b'"translationActive="': b'" translationActive="',
+    b'"scaleActive="': b'" scaleActive="',
+    b'"playSound="': b'" playSound="',
+    b'"rotationActive="': b'" rotationActive="',
+    b'"visibilityActive="': b'" visibilityActive="',
+    b'"index="': b'" index="',
+
+    b'<function>https://www.facebook.com/ETA-La-Marchoise-318371215013344/?ref=ts&fref=ts</function>': b'',
+
+    b'-- aanimazioni tubi --': b' aanimazioni tubi ',
+}
+_XML_FIXES_RE = re.compile(b'|'.join(re.escape(old) for old in _XML_FIXES))
+
+# Comment-shenanigans in FS17_Guellepack.zip
+_XML_COMMENTED_BLOCK_RE = re.compile(rb'^<!--<vehicleTypeConfigurations>(.*?)^-->\s*$', re.MULTILINE | re.DOTALL)
+# Comments may contain invalid tokens (like --), so empty them.
+_XML_COMMENT_RE = re.compile(rb'<!--(.*?)-->')
 
 
 # ============================================================================
@@ -22,24 +110,30 @@ class Mod(object):
     via its member variables.
     """
     # ========================================================================
-    def __init__(self, zipfile: str, GAME_DIR: str, IMG_SIZE: int) -> None:
+    def __init__(self, zipfile: str, GAME_DIR: str, IMG_SIZE: int, ICON_CACHE: str = None) -> None:
         # ------------------------------------------------------------------------
         self.GAME_DIR: str = GAME_DIR
         '''The installation folder of the FS17 game.'''
         self.IMG_SIZE: int = IMG_SIZE
         '''The size, to which all icons will be scaled to.'''
+        self.ICON_CACHE: str = ICON_CACHE
+        '''Existing folder to cache the converted icons in. (None: No caching.)'''
         # ------------------------------------------------------------------------
         self.zipfile = os.path.basename(zipfile)
         self.fullfile = zipfile
         '''The name of the ZIP file of the Mod.'''
-        self.modDesc = ET.Element('')
-        '''The modDesc.xml as xml.etree.ElementTree Element'''
+        self.modDesc = None
+        '''The modDesc.xml as ElementTree Element. (Only while loading.)'''
         self.has_maps = False
         '''True, if the Mod contains a map.'''
         self.title = ''
         '''The title of the Mod'''
-        self.icon_b64 = ''
-        '''Base64 representation of the Mod icon.'''
+        self.icon_data = b''
+        '''The Mod icon as image file content. (Base64 encoded only, when it is written.)'''
+        self.icon_type = ''
+        '''MIME type of the Mod icon in icon_data.'''
+        self.icon_url = ''
+        '''URL of the Mod icon, if the browser can show it from disk. (Instead of icon_data.)'''
         self.author = ''
         '''Author of the Mod.'''
         self.version = ''
@@ -48,127 +142,217 @@ class Mod(object):
         '''Mod description, can be lenghty...'''
         self.multiplayer = False
         '''True, if the Mod claims to support multiplayer.'''
+        self.warnings = []
+        '''Problems found while loading the Mod, to be shown by the caller.'''
         # ------------------------------------------------------------------------
         self.load()
 
+    # ========================================================================
+    # Base64 representation of the Mod icon, encoded from icon_data on demand.
+    @property
+    def icon_b64(self) -> str:
+        return _b64encode(self.icon_data)
+
     # ========================================================================
     def load(self) -> None:
         # ------------------------------------------------------------------------
         with ZipFile(self.fullfile, 'r') as zip:
             # ------------------------------------------------------------------------
             self.ZipFile = zip
+            # The resolved $l10n_ texts, and the l10n texts of the mod by name.
+            # (Filled when needed, while loading.)
+            self._l10n_cache = {}
+            self._l10n_texts = None
+            self._l10n_file_texts = None
             # ------------------------------------------------------------------------
-            # Read the modDesc.xml file content.
-            xml = zip.read('modDesc.xml').decode()
-            # ------------------------------------------------------------------------
-            # Fix a few issues with the modDesc.xml of some mods.
-            # Otherwise, ET.fromstring() will fail!
-            xml = Mod._fix_xml(xml)
+            # Read the modDesc.xml file content and create an ET Element from it.
+            self.modDesc = Mod._read_mod_desc(zip)
             # ------------------------------------------------------------------------
-            # Create an ET Element from the XML.
-            self.modDesc = ET.fromstring(xml)
+            # Collect the top level tags in one go, instead of searching for each of them.
+            top = Mod._children(self.modDesc)
             # ------------------------------------------------------------------------
             # Is the mod a Map?
-            self.has_maps = self.modDesc.find('./maps') is not None
+            self.has_maps = 'maps' in top
             # ------------------------------------------------------------------------
             # Get the Mod title.
-            self.title = self._get_mod_title()
+            self.title = self._get_mod_title(top.get('title'))
             # ------------------------------------------------------------------------
-            # Get the Base64 representation of the icon from the ZIP file.
-            self.icon_b64 = self._find_icon(zip)
+            # Get the raw icon data (type, bytes) from the ZIP file,
+            # or the URL of the icon on disk.
+            self.icon_type, self.icon_data, self.icon_url = self._find_icon(zip, top['iconFilename'])
             # ------------------------------------------------------------------------
             # Get Author name and version
-            self.author = self.modDesc.find('./author').text
-            self.version = self.modDesc.find('./version').text
+            self.author = top['author'].text
+            self.version = top['version'].text
             # ------------------------------------------------------------------------
             # Get the description text of the Mod
-            description = self.modDesc.find('./description')
+            description = top['description']
             description_en = description.find('./en')
             if description_en is not None:
                 description = description_en
-            self.description = description.text.strip().replace('\n', '<br>\n')
+            self.description = description.text.strip()
             # ------------------------------------------------------------------------
             # Is Multiplayer supported?
             self.multiplayer = False
-            MP = self.modDesc.find('./multiplayer')
+            MP = top.get('multiplayer')
             if MP is not None:
                 if 'supported' in MP.attrib:
                     self.multiplayer = MP.attrib['supported'] == 'true'
             # ------------------------------------------------------------------------
             # Get the listed store items.
-            self.store_item_xmls = [item.attrib['xmlFilename'] for item in self.modDesc.findall('./storeItems/storeItem')]
+            self.store_item_xmls = []
+            if 'storeItems' in top:
+                self.store_item_xmls = [item.attrib['xmlFilename'] for item in top['storeItems'].findall('./storeItem')]
             # self.store_items = [ Item(ET.fromstring(zip.read(item_xml).decode())) for item_xml in self.store_item_xmls ]
             self.store_items = []
             for item_xml in self.store_item_xmls:
-                print(' -- ', item_xml)
-                try:
-                    xml = zip.read(item_xml)
-                except:
-                    print(f'***WARNING: Error reading store item file: {item_xml} from zip file: {self.fullfile}' )
-                    continue
-                try:
-                    xml = xml.decode() 
-                except:
-                    print(f'***WARNING: Invalid store item file: {item_xml} from zip file: {self.fullfile}' )
+                # Check the ZIP directory first, instead of failing to read the file.
+                if item_xml not in zip.NameToInfo:
+                    self.warnings.append(f'***WARNING: Error reading store item file: {item_xml} from zip file: {self.fullfile}')
                     continue
                 try:
-                    xml = Mod._fix_xml(xml)
-                    xml = ET.fromstring(xml)
+                    store_data = Mod._read_store_data(zip, item_xml)
                 except Exception as e:
-                    print(f'***WARNING: Invalid XML file: {item_xml} from zip file: {self.fullfile}' )
-                    print(e)
+                    self.warnings.append(f'***WARNING: Invalid XML file: {item_xml} from zip file: {self.fullfile}\n{e}')
                     continue
-                self.store_items.append(Item(self, xml))
+                self.store_items.append(Item(self, store_data))
             # ------------------------------------------------------------------------
+            # Drop the parsed XML, it is not needed anymore after loading.
+            # (lxml Elements can't be pickled anyway.)
             del self.ZipFile
+            del self._l10n_cache, self._l10n_texts, self._l10n_file_texts
+            self.modDesc = None
+
+    # ============================================================================
+    # Read a XML file from the ZIP file into an ET Element.
+    @staticmethod
+    def _read_xml(zip: ZipFile, name: str):
+        # ------------------------------------------------------------------------
+        # Most XML files are fine, so parse them directly from the ZIP stream.
+        try:
+            with zip.open(name) as f_in:
+                parser = _STRICT_PARSER if _STRICT_PARSER is not None else ET.XMLParser(encoding='utf-8')
+                return ET.parse(f_in, parser).getroot()
+        except ET.ParseError:
+            pass
+        # ------------------------------------------------------------------------
+        # Otherwise, read the whole file and try to fix it.
+        return Mod._parse_xml(zip.read(name))
+
+    # ============================================================================
+    # Parse a XML file from the ZIP stream incrementally.
+    @staticmethod
+    def _iterparse(f_in):
+        if _STRICT_PARSER is not None:
+            options = {'encoding': 'utf-8', 'remove_comments': True}
+        else:
+            options = {'parser': ET.XMLParser(encoding='utf-8')}
+        return ET.iterparse(f_in, events=('start', 'end'), **options)
+
+    # ============================================================================
+    # Read the <storeData> Element of a store item XML file from the ZIP file. (None, if missing.)
+    # The store item files of vehicles are large, but only <storeData> is needed,
+    # which is usually at the beginning. So stop parsing, as soon as it is complete.
+    @staticmethod
+    def _read_store_data(zip: ZipFile, name: str):
+        # ------------------------------------------------------------------------
+        try:
+            with zip.open(name) as f_in:
+                depth = 0
+                for event, elem in Mod._iterparse(f_in):
+                    if event == 'start':
+                        depth += 1
+                        continue
+                    depth -= 1
+                    if depth == 1:
+                        if elem.tag == 'storeData':
+                            return elem
+                        # Other top level tags are not needed.
+                        elem.clear()
+                return None
+        except ET.ParseError:
+            pass
+        # ------------------------------------------------------------------------
+        # Otherwise, read the whole file and try to fix it.
+        return Mod._parse_xml(zip.read(name)).find('./storeData')
+
+    # ============================================================================
+    # Read the modDesc.xml from the ZIP file into an ET Element.
+    # Only the tags in _MOD_DESC_TAGS are kept, the others (vehicle types,
+    # specializations, input bindings, ...) are dropped as soon as they are parsed.
+    @staticmethod
+    def _read_mod_desc(zip: ZipFile):
+        # ------------------------------------------------------------------------
+        try:
+            with zip.open('modDesc.xml') as f_in:
+                root = None
+                depth = 0
+                for event, elem in Mod._iterparse(f_in):
+                    if event == 'start':
+                        depth += 1
+                        if root is None:
+                            root = elem
+                    else:
+                        depth -= 1
+                        if depth == 1 and elem.tag not in _MOD_DESC_TAGS:
+                            elem.clear()
+                return root
+        except ET.ParseError:
+            pass
+        # ------------------------------------------------------------------------
+        # Otherwise, read the whole file and try to fix it.
+        return Mod._parse_xml(zip.read('modDesc.xml'))
+
+    # ============================================================================
+    # Parse the content of a XML file from the ZIP file into an ET Element.
+    @staticmethod
+    def _parse_xml(data: bytes):
+        # ------------------------------------------------------------------------
+        # Fix a few issues with the XML files of some mods.
+        # Otherwise, ET.fromstring() will fail!
+        xml = Mod._fix_xml(data)
+        # ------------------------------------------------------------------------
+        if _XML_PARSER is None:
+            return ET.fromstring(xml, ET.XMLParser(encoding='utf-8'))
+        # ------------------------------------------------------------------------
+        root = ET.fromstring(xml, _XML_PARSER)
+        if root is None:
+            # Nothing left to recover.
+            raise ET.ParseError('No XML element found', 0, 0, 0)
+        return root
+
+    # ============================================================================
+    # Get the child elements of an Element by tag name.
+    # (Like Element.find(), the first one wins for duplicate tags.)
+    @staticmethod
+    def _children(node) -> dict:
+        children = {}
+        for child in node:
+            children.setdefault(child.tag, child)
+        return children
 
     # ============================================================================
     # Fix a few issues with the modDesc.xml of some mods.
     # Otherwise, ET.fromstring() will fail!
     @staticmethod
-    def _fix_xml(xml: str) -> str:
+    def _fix_xml(xml: bytes) -> bytes:
         # ------------------------------------------------------------------------
-        # Ampersand is not allowed raw!
-        xml = xml.replace(' & ', ' and ')
-        # -- is not allowed raw!
-        xml = xml.replace('Fill--and', 'Fill-and')
-        # Some spaces are missing in some files.
-        xml = xml.replace('partOfEconomy="true"', 'partOfEconomy="true" ')
-        xml = xml.replace('"configFilename=', '" configFilename=')
-        xml = xml.replace('"baleTypesDirectory=', '" baleTypesDirectory=')
-        # Some more invalid tokens in Beta mods.
-        xml = xml.replace('Bressel&Lade', 'Bressel+Lade')
-        xml = xml.replace('and enjoy.]]></de>', 'and enjoy.</de>')
-
-        xml = xml.replace('"endTransLimit="', '" endTransLimit="')
-        xml = xml.replace('"translationActive="', '" translationActive="')
-        xml = xml.replace('"scaleActive="', '" scaleActive="')
-        xml = xml.replace('"playSound="', '" playSound="')
-        xml = xml.replace('"rotationActive="', '" rotationActive="')
-        xml = xml.replace('"visibilityActive="', '" visibilityActive="')
-        xml = xml.replace('"index="', '" index="')
-
-
-        xml = xml.replace('<function>https://www.facebook.com/ETA-La-Marchoise-318371215013344/?ref=ts&fref=ts</function>', '')
-
-        xml = xml.replace('-- aanimazioni tubi --', ' aanimazioni tubi ')
+        # Replace all the known invalid strings in one pass.
+        xml = _XML_FIXES_RE.sub(lambda m: _XML_FIXES[m.group(0)], xml)
 
         # Remove comments
-
-        # Comment-shenanigans in FS17_Guellepack.zip
-        xml = re.sub(r'^<!--<vehicleTypeConfigurations>(.*?)^-->\s*$', '\n\n\n\n\n\n\n\n\n', xml, flags=re.MULTILINE | re.DOTALL)
-
-        xml = re.sub(r'<!--(.*?)-->', '<!-- -->', xml )
-        
+        # (With precompiled patterns, as this runs for every broken XML file.)
+        xml = _XML_COMMENTED_BLOCK_RE.sub(b'\n\n\n\n\n\n\n\n\n', xml)
+        xml = _XML_COMMENT_RE.sub(b'<!-- -->', xml)
         # ------------------------------------------------------------------------
         return xml
 
     # ============================================================================
-    # Find the icon
-    def _find_icon(self, zip: ZipFile) -> str:
+    # Find the icon. Returns a tuple (icon_type, icon_data, icon_url),
+    # either icon_url or the others are empty.
+    def _find_icon(self, zip: ZipFile, icon_file) -> tuple:
         # ------------------------------------------------------------------------
-        # Get the icon file name.
-        icon_file = self.modDesc.find('./iconFilename')
+        # Get the icon file name from the <iconFilename> tag.
         # Check, if there is a sub-tag "<en>".
         icon_file_en = icon_file.find('./en')
         if icon_file_en is not None:
@@ -182,61 +366,138 @@ class Mod(object):
         data_store = os.path.join(self.GAME_DIR, 'data', 'store')
         icon_file = icon_file.replace('$data/store/', data_store+'/')
         # ------------------------------------------------------------------------
-        while True:
-            # ------------------------------------------------------------------------
-            try:
-                icon_b64 = Mod.get_icon(zip, icon_file, self.IMG_SIZE)
-            # ------------------------------------------------------------------------
-            except KeyError:
-                # ------------------------------------------------------------------------
-                # Some mods have the wrong file extension (.png instead of .dds), fix it and try again.
-                if icon_file.endswith('.png'):
-                    icon_file = icon_file.replace('.png', '.dds')
-                    continue
-                # ------------------------------------------------------------------------
-                # FATAL: Unable to find icon file.
-                print('Unkown Icon file:', icon_file_org, " in ", self.zipfile)
-                raise KeyError
-            break
+        # Some mods have the wrong file extension (.png instead of .dds), so try both.
+        candidates = [icon_file]
+        if icon_file.endswith('.png'):
+            candidates.append(icon_file[:-4] + '.dds')
+        # ------------------------------------------------------------------------
+        # Look up the names in the ZIP directory, instead of trying and failing to read them.
+        names = zip.NameToInfo
+        for candidate in candidates:
+            if candidate in names:
+                return self._get_cached_icon(zip, candidate) + ('',)
         # ------------------------------------------------------------------------
-        return icon_b64
+        # Only then check the disk. (Most icons are in the ZIP file.)
+        for candidate in candidates:
+            if os.path.exists(candidate):
+                # Browsers can show PNG and JPEG files directly, no need to embed them.
+                if candidate.lower().endswith(_WEB_IMAGE_TYPES):
+                    return '', b'', pathlib.Path(os.path.abspath(candidate)).as_uri()
+                return Mod.get_icon(zip, candidate, self.IMG_SIZE) + ('',)
+        # ------------------------------------------------------------------------
+        # FATAL: Unable to find icon file.
+        raise KeyError(f'Unkown Icon file: {icon_file_org} in {self.zipfile}')
 
     # ============================================================================
-    @staticmethod
-    def get_icon(zip: ZipFile, icon_name: str, IMG_SIZE: int) -> str:
+    # Get the icon from the ZIP file, from the icon cache if possible.
+    # The cache files are named after the CRC and the size of the icon,
+    # which are known from the ZIP directory without reading the icon.
+    # (So mods with the same icon share the cache file.)
+    # The first line of a cache file is the MIME type, the rest is the image data.
+    def _get_cached_icon(self, zip: ZipFile, icon_name: str) -> tuple:
+        # ------------------------------------------------------------------------
+        if self.ICON_CACHE is None:
+            return Mod.get_icon(zip, icon_name, self.IMG_SIZE)
+        # ------------------------------------------------------------------------
+        info = zip.NameToInfo[icon_name]
+        cache_file = os.path.join(self.ICON_CACHE, f'{info.CRC:08x}.{info.file_size}.{self.IMG_SIZE}.img')
+        try:
+            with open(cache_file, 'rb') as f_in:
+                icon_type, _, icon_data = f_in.read().partition(b'\n')
+                return icon_type.decode('ascii'), icon_data
+        except OSError:
+            pass
         # ------------------------------------------------------------------------
-        # Try to read the icon from the zip file.
+        icon_type, icon_data = Mod.get_icon(zip, icon_name, self.IMG_SIZE)
+        # Write to a temporary file first, so an interrupted run leaves no broken cache file.
+        # (The cache is optional, so errors are ignored.)
+        tmp_file = f'{cache_file}.{os.getpid()}.tmp'
         try:
-            in_bytes = zip.read(icon_name)
+            with open(tmp_file, 'wb') as f_out:
+                f_out.write(f'{icon_type}\n'.encode('ascii'))
+                f_out.write(icon_data)
+            os.replace(tmp_file, cache_file)
+        except OSError:
+            pass
+        # ------------------------------------------------------------------------
+        return icon_type, icon_data
+
+    # ============================================================================
+    # Get the icon as a tuple (icon_type, icon_data).
+    @staticmethod
+    def get_icon(zip: ZipFile, icon_name: str, IMG_SIZE: int) -> tuple:
+        # ------------------------------------------------------------------------
+        # Read the icon from the zip file, if it is in there.
+        # (A lookup in the ZIP directory is cheaper than a failing read.)
+        info = zip.NameToInfo.get(icon_name)
+        if info is not None:
+            key = (info.CRC, info.file_size, IMG_SIZE)
+            icon = _ZIP_ICONS.get(key)
+            if icon is None:
+                # Open the member by its ZipInfo, which skips a second name lookup.
+                # Pillow reads the image directly from the ZIP stream.
+                with zip.open(info) as f_in:
+                    icon = Mod._encode_icon(f_in, IMG_SIZE)
+                _ZIP_ICONS[key] = icon
+            return icon
         # ------------------------------------------------------------------------
         # Otherwise, try to read the file from local storage
-        except:
-            # Check if the file exists outside the ZIP file.
-            if os.path.exists(icon_name):
-                with open(icon_name, 'rb') as f_in:
-                    in_bytes = f_in.read()
-            else:
-                raise KeyError
+        elif os.path.exists(icon_name):
+            return Mod._get_disk_icon(os.path.abspath(icon_name), IMG_SIZE)
+        else:
+            raise KeyError(icon_name)
+
+    # ============================================================================
+    # Icons outside the ZIP files (e.g. from the game store) are shared by
+    # many mods, so each of them is only converted once.
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def _get_disk_icon(icon_name: str, IMG_SIZE: int) -> tuple:
+        with open(icon_name, 'rb') as f_in:
+            return Mod._encode_icon(f_in, IMG_SIZE)
+
+    # ============================================================================
+    # Read the icon image from a (seekable) file object and convert it to
+    # the standard size. Returns a tuple (icon_type, icon_data).
+    @staticmethod
+    def _encode_icon(in_stream, IMG_SIZE: int) -> tuple:
         # ------------------------------------------------------------------------
-        # Read the icon image and convert it to a Base64 representation PNG.
-        with BytesIO(in_bytes) as in_stream:
-            # Open the image using PIL Image.
+        # Open the image using PIL Image.
+        # Only probe the usual icon formats, instead of all the formats Pillow knows.
+        try:
+            image = Image.open(in_stream, formats=_ICON_FORMATS)
+        except UnidentifiedImageError:
+            in_stream.seek(0)
             image = Image.open(in_stream)
-            # Scale the image to standard size.
-            image = image.resize((IMG_SIZE, IMG_SIZE))
-            # Convert the image.
-            with BytesIO() as out_stream:
-                # Convert Image to PNG.
-                image.save(out_stream, format='png')
-                # Convert Image to Base64.
-                out_base64 = base64.b64encode(out_stream.getvalue()).decode()
+        # A PNG of the right size can be used as it is.
+        if image.format == 'PNG' and image.size == (IMG_SIZE, IMG_SIZE):
+            in_stream.seek(0)
+            return 'image/png', in_stream.read()
+        # Let JPEG images be decoded at a reduced size already.
+        image.draft('RGB', (IMG_SIZE, IMG_SIZE))
+        # Decode the image now, while the stream is open.
+        image.load()
+        # Scale the image to standard size, unless it has that size already.
+        # Large images are reduced by a fast box filter first.
+        if image.size != (IMG_SIZE, IMG_SIZE):
+            image = image.resize((IMG_SIZE, IMG_SIZE), _RESAMPLE, reducing_gap=2.0)
+        # Convert the image.
+        out_stream = _ICON_BUFFER
+        out_stream.seek(0)
+        out_stream.truncate()
+        # Convert Image to WEBP (or PNG).
+        # (Fast compression: converting many icons is dominated by the compression effort.)
+        if _ICON_SAVE_FORMAT == 'WEBP':
+            image.save(out_stream, format='webp', quality=80, method=4)
+        else:
+            image.save(out_stream, format='png', optimize=False, compress_level=1)
         # ------------------------------------------------------------------------
-        return out_base64
+        return ICON_SAVE_TYPE, out_stream.getvalue()
 
     # ============================================================================
     # Get the title of the mod from the mod description XML.
-    def _get_mod_title(self) -> str:
-        title = self.l10n(self.modDesc.find('./title'))
+    def _get_mod_title(self, node) -> str:
+        title = self.l10n(node)
         if title == '':
             return 'UNKNOWN'
         return title
@@ -245,11 +506,12 @@ class Mod(object):
     def l10n(self, node) -> str:
         sub = None
         if node is not None:
-            sub = node.find('./en')
-            if sub is None:
-                sub = node.find('./de')
-                if sub is None:
-                    sub = node.find('./fr')
+            # Prefer english, then german, then french.
+            children = Mod._children(node)
+            for lang in ('en', 'de', 'fr'):
+                sub = children.get(lang)
+                if sub is not None:
+                    break
         result = ''
         if node is not None:
             result = node.text
@@ -260,24 +522,40 @@ class Mod(object):
         return result
 
     # ============================================================================
+    # Store items often use the same texts, so each of them is only resolved once.
     def _l10n(self, text:str) -> str:
+        result = self._l10n_cache.get(text)
+        if result is None:
+            result = self._l10n_cache[text] = self._find_l10n(text)
+        return result
+
+    # ============================================================================
+    def _find_l10n(self, text:str) -> str:
         to_find = text.replace('$l10n_','')
-        l10ns = self.modDesc.findall('./l10n/text')
-        for l10n in l10ns:
-            if l10n.attrib['name'] == to_find:
-                return self.l10n(l10n)
+        # ------------------------------------------------------------------------
+        # The texts in the modDesc.xml. (The first one wins for duplicate names.)
+        if self._l10n_texts is None:
+            self._l10n_texts = {}
+            for l10n in self.modDesc.findall('./l10n/text'):
+                self._l10n_texts.setdefault(l10n.attrib['name'], l10n)
+        l10n = self._l10n_texts.get(to_find)
+        if l10n is not None:
+            return self.l10n(l10n)
+        # ------------------------------------------------------------------------
         l10n = self.modDesc.find('./l10n')
         if l10n is not None:
             if 'filenamePrefix' in l10n.attrib:
                 prefix = l10n.attrib['filenamePrefix']
                 # ------------------------------------------------------------------------
-                # Read the modDesc.xml file content.
-                xml = self.ZipFile.read(prefix+'_en.xml').decode()
-                xml = ET.fromstring(xml)
-                l10n_texts = xml.findall('./texts/text')
-                for l10n_text in l10n_texts:
-                    if l10n_text.attrib['name'] == to_find:
-                        return l10n_text.attrib['text']
+                # Read the l10n file only once.
+                if self._l10n_file_texts is None:
+                    xml = Mod._read_xml(self.ZipFile, prefix+'_en.xml')
+                    self._l10n_file_texts = {}
+                    for l10n_text in xml.findall('./texts/text'):
+                        self._l10n_file_texts.setdefault(l10n_text.attrib['name'], l10n_text.attrib['text'])
+                result = self._l10n_file_texts.get(to_find)
+                if result is not None:
+                    return result
                 # ------------------------------------------------------------------------
         return text
 
@@ -285,29 +563,40 @@ class Mod(object):
 # ============================================================================
 class Item(object):
     # ============================================================================
-    def __init__(self, mod:Mod, xml:ET.Element) -> None:
-        self.xml = xml
-        self.category = mod.l10n(xml.find('./storeData/category'))
+    def __init__(self, mod:Mod, store_data:ET.Element) -> None:
+        # (The Element itself is not kept, only the values.)
+        # Collect the tags of <storeData> in one go, instead of searching each path.
+        data = Mod._children(store_data) if store_data is not None else {}
+
+        self.category = mod.l10n(data.get('category'))
         try:
-            self.brand = mod.l10n(xml.find('./storeData/brand'))
+            self.brand = mod.l10n(data.get('brand'))
         except AttributeError as e:
             self.brand = ''  # '(no brand)'
 
-        self.name = mod.l10n(xml.find('./storeData/name'))
+        self.name = mod.l10n(data.get('name'))
 
         self.price = '0'
         self.dailyUpkeep = '0'
         
         try:
-            self.price = xml.find('./storeData/price').text
+            self.price = data.get('price').text
         except AttributeError as e:
             self.price = '0'
 
+        # (An empty <dailyUpkeep/> has no text, it counts as no upkeep.)
         try:
-            self.dailyUpkeep = xml.find('./storeData/dailyUpkeep').text
+            self.dailyUpkeep = data.get('dailyUpkeep').text or '0'
         except AttributeError as e:
             self.dailyUpkeep = '0'
 
+        # The price with thousands separators, formatted once here.
+        # (Prices which aren't whole numbers are shown as they are, an empty <price/> as 0.)
+        try:
+            self.price_str = f'{int(self.price):,}'
+        except (TypeError, ValueError):
+            self.price_str = self.price or '0'
+
     # ============================================================================
     
 
@@ -0,0 +1,44 @@
+"""Tests for the store items read by fs17."""
+
+import unittest
+
+from fs17 import ET, Mod, Item
+
+
+# ============================================================================
+# A Mod without ZIP file, enough to create store items.
+# (Texts without '$l10n_' are returned as they are.)
+def make_mod() -> Mod:
+    mod = Mod.__new__(Mod)
+    mod._l10n_cache = {}
+    return mod
+
+
+# ============================================================================
+class ItemTest(unittest.TestCase):
+
+    # ========================================================================
+    def make_item(self, xml: str) -> Item:
+        return Item(make_mod(), ET.fromstring(xml))
+
+    # ========================================================================
+    def test_empty_daily_upkeep(self):
+        item = self.make_item('<storeData><name>Tractor</name><price>1000</price>'
+                              '<dailyUpkeep/></storeData>')
+        self.assertEqual(item.dailyUpkeep, '0')
+        self.assertEqual(item.price_str, '1,000')
+
+    # ========================================================================
+    def test_empty_price(self):
+        item = self.make_item('<storeData><name>Tractor</name><price/></storeData>')
+        self.assertEqual(item.price_str, '0')
+
+    # ========================================================================
+    def test_price_not_a_whole_number(self):
+        item = self.make_item('<storeData><name>Tractor</name><price>999.5</price></storeData>')
+        self.assertEqual(item.price_str, '999.5')
+
+
+# ============================================================================
+if __name__ == '__main__':
+    unittest.main()
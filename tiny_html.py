@@ -2,88 +2,136 @@
 
 from __future__ import annotations
 
+import gzip
+from html import escape
+
 # ============================================================================
 INDENT = ' '    # Intentation to be used.
 LINEBR = '\n'   # Linebreak character
+PREAMBLE = '<!doctype html>' + LINEBR   # Default preamble of a HTML document.
+
+# Elements without content and end tag in HTML.
+VOID_TAGS = frozenset(('area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input',
+                       'link', 'meta', 'param', 'source', 'track', 'wbr'))
 
 
 # ============================================================================
 class Tag(object):
     """Class to facilitate creating tags for HTML documents."""
 
+    # No __dict__ for each of the (many) tags of a document.
+    __slots__ = ('name', 'attrs', 'text', 'children', 'frozen')
+
     # ========================================================================
-    def __init__(self, name: str, attributes: dict = {}, text: str = None) -> None:
+    def __init__(self, name: str, attributes: dict = None, text: str = None, raw: bool = False) -> None:
         self.name = name
-        self.attributes = attributes
-        self.text = text
+        # The attributes are escaped and joined once here, in the order they were given.
+        # (None or empty, for most tags.)
+        self.attrs = ''.join([f' {n}="{escape(v)}"' for n, v in attributes.items()]) \
+            if attributes else ''
+        # The text is escaped once here, unless it is deliberate HTML.
+        self.text = text if (raw or text is None) else escape(text, quote=False)
         self.children = []
+        # HTML of a frozen tag, per indentation. (None, unless the tag is frozen.)
+        self.frozen = None
 
     # ========================================================================
     # Add the given tag to the list of sub-tags.
-    def add(self, tag: Tag) -> None:
+    # A string is added as ready-made HTML, and written as it is.
+    def add(self, tag: Tag | str) -> None:
         self.children.append(tag)
 
+    # ========================================================================
+    # Add all given tags and strings at once, in the given order.
+    def extend(self, tags) -> None:
+        self.children.extend(tags)
+
     # ========================================================================
     # Create a new sub-tag using the given parameters, add it to the
     # current tag and return it to the caller.
-    def tag(self, name: str, attributes: dict = {}, text: str = None) -> Tag:
-        tag = Tag(name, attributes, text)
+    def tag(self, name: str, attributes: dict = None, text: str = None, raw: bool = False) -> Tag:
+        tag = Tag(name, attributes, text, raw)
         self.add(tag)
         return tag
 
+    # ========================================================================
+    # Freeze the Tag, when it will not be changed anymore but written several times.
+    # The HTML is then created once per indentation and reused afterwards.
+    def freeze(self) -> Tag:
+        if self.frozen is None:
+            self.frozen = {}
+        return self
+
     # ========================================================================
     # Convert the Tag to an HTML string.
+    # The fragments are collected in a list and joined only once.
     def html(self, indent='') -> str:
+        parts = []
+        self._emit(parts.append, indent)
+        return ''.join(parts)
+
+    # ========================================================================
+    # Write the Tag as HTML to the given file object.
+    def write(self, out, indent='') -> None:
+        self._emit(out.write, indent)
+
+    # ========================================================================
+    # Pass the HTML fragments of the Tag to the given function, one by one.
+    def _emit(self, out, indent: str) -> None:
+        if self.frozen is None:
+            self._emit_tag(out, indent)
+            return
         # ------------------------------------------------------------------------
-        s = indent + "<" + self.name
+        html = self.frozen.get(indent)
+        if html is None:
+            parts = []
+            self._emit_tag(parts.append, indent)
+            html = self.frozen[indent] = ''.join(parts)
+        out(html)
+
+    # ========================================================================
+    # Pass the HTML fragments of the Tag itself and its children to the given function.
+    def _emit_tag(self, out, indent: str) -> None:
         # ------------------------------------------------------------------------
-        if len(self.attributes) > 0:
-            for n in sorted(self.attributes):
-                s += ' ' + n + '="' + self.attributes[n] + '"'
+        name = self.name
+        attrs = self.attrs
+        text = self.text
+        children = self.children
         # ------------------------------------------------------------------------
-        if (self.text is not None) or len(self.children) > 0:
-            # ------------------------------------------------------------------------
-            s += '>'
-            # ------------------------------------------------------------------------
-            has_children = len(self.children) > 0
-            multi_line = has_children
-            # ------------------------------------------------------------------------
-            if not multi_line:
-                if self.text is not None:
-                    if ('\n' in self.text):
-                        multi_line = True
-            # ------------------------------------------------------------------------
-            if multi_line:
-                s += LINEBR
-            # ------------------------------------------------------------------------
-            if self.text is not None:
-                if multi_line:
-                    s += indent + INDENT
-                s += self.text
-                if multi_line:
-                    s += LINEBR
-            # ------------------------------------------------------------------------
-            if has_children:
-                for child in self.children:
-                    s += child.html(indent + INDENT)
-            # ------------------------------------------------------------------------
-            if multi_line:
-                s += indent
-            s += "</" + self.name
+        # Tags on a single line are written with one call.
+        if not children:
+            if text is None:
+                # Void elements have no end tag, other empty elements need one.
+                if name in VOID_TAGS:
+                    out(f'{indent}<{name}{attrs}>{LINEBR}')
+                else:
+                    out(f'{indent}<{name}{attrs}></{name}>{LINEBR}')
+                return
+            if '\n' not in text:
+                out(f'{indent}<{name}{attrs}>{text}</{name}>{LINEBR}')
+                return
         # ------------------------------------------------------------------------
-        else:
-            if self.name not in ['br']:
-                s += '/'
+        # Indentation of the content, built once for all children.
+        inner_indent = indent + INDENT
+        out(f'{indent}<{name}{attrs}>{LINEBR}')
+        if text is not None:
+            out(f'{inner_indent}{text}{LINEBR}')
         # ------------------------------------------------------------------------
-        s += '>' + LINEBR
+        for child in children:
+            if isinstance(child, str):
+                out(child)
+            else:
+                child._emit(out, inner_indent)
         # ------------------------------------------------------------------------
-        return s
+        out(f'{indent}</{name}>{LINEBR}')
 
 
 # ============================================================================
 class Html(Tag):
     """Class representing a HTML document."""
 
+    __slots__ = ('charset', 'preamble', 'head', 'body')
+
     # ========================================================================
     def __init__(self, create_head_and_body=True, charset='utf-8') -> None:
         # ------------------------------------------------------------------------
@@ -93,7 +141,7 @@ class Html(Tag):
         # ------------------------------------------------------------------------
         # Set preamble variable now. 
         # The user can overwrite it afterwards, if they want to.
-        self.preamble = '<!doctype html>' + LINEBR
+        self.preamble = PREAMBLE
         # ------------------------------------------------------------------------
         if create_head_and_body:
             self.head = super().tag('head')
@@ -102,13 +150,23 @@ class Html(Tag):
         # ------------------------------------------------------------------------
 
     # ========================================================================
-    def html(self) -> str:
-        return self.preamble + super().html()
+    # Emit the preamble and the document.
+    def _emit(self, out, indent: str) -> None:
+        out(self.preamble)
+        super()._emit(out, indent)
 
     # ========================================================================
+    # Write the document directly into the file, without building one big string.
+    # A filename ending with '.gz' is written gzip compressed.
     def save(self, filename):
-        with open(filename, 'wt', encoding=self.charset, errors="surrogateescape") as f_out:
-            f_out.write(self.html())
+        if filename.endswith('.gz'):
+            f_out = gzip.open(filename, 'wt', compresslevel=6, encoding=self.charset,
+                              errors="surrogateescape")
+        else:
+            f_out = open(filename, 'wt', encoding=self.charset, errors="surrogateescape",
+                         buffering=1 << 20)
+        with f_out:
+            self.write(f_out)
 
 
 # ============================================================================